@@ -1,16 +1,76 @@
 # Cypher utils
 
 
+import contextlib
+import functools
+import mmap
+import os
 from pathlib import Path
 
 from PySide2 import QtWidgets
 
 
+# Files larger than this many bytes are read through a memory map
+MMAP_READ_THRESHOLD = 1_000_000
+
+
+@functools.lru_cache(maxsize=16)
+def _load_qss(path: str) -> str:
+    with open(path, 'r') as f:
+        return f.read()
+
+
 def set_stylesheet(tool: QtWidgets.QWidget, qss_file: str = 'darkorange.css'):
     qss_input_name = Path(qss_file)
     qss_file_name = f'{qss_input_name.stem}.css'
-    qss_path = Path(Path(__file__).parent, 'resources', qss_file_name)
+    qss_path = Path(Path(__file__).parent, 'resources', qss_file_name).resolve()
+
+    tool.setStyleSheet(_load_qss(str(qss_path)))
+
+
+@contextlib.contextmanager
+def updates_suspended(widget: QtWidgets.QWidget, block_signals: bool = False):
+    """
+    Disables painting of the widget for the duration of the block, so several
+    changes are laid out and drawn in a single pass once it exits.
+
+    Args:
+        widget: The widget to suspend.
+
+        block_signals: Also block the widget's signals for the duration of the block.
+    """
+    was_enabled = widget.updatesEnabled()
+    was_blocked = widget.signalsBlocked()
+    widget.setUpdatesEnabled(False)
+    if block_signals:
+        widget.blockSignals(True)
+    try:
+        yield widget
+    finally:
+        widget.blockSignals(was_blocked)
+        widget.setUpdatesEnabled(was_enabled)
+
+
+def read_text(path: Path) -> str:
+    """
+    Reads a file as UTF-8, mapping files over MMAP_READ_THRESHOLD bytes into memory
+    so they are decoded in one pass without being buffered by python first.
+    Line endings are left untranslated.
+
+    Args:
+        path: The file to read.
+
+    Returns:
+        str: The contents of the file.
+
+    Raises:
+        UnicodeDecodeError: The file isn't UTF-8. It isn't opened rather than replacing the
+        bytes, saving the tab would write the replacements back over the file.
+    """
+    with open(path, 'rb') as f:
+        # Small files are read in one call, mapping them costs more than it saves
+        if os.fstat(f.fileno()).st_size <= MMAP_READ_THRESHOLD:
+            return f.read().decode('utf-8')
 
-    with open(qss_path, 'r') as f:
-        stylesheet = f.read()
-        tool.setStyleSheet(stylesheet)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[:].decode('utf-8')
@@ -0,0 +1,212 @@
+"""
+# Cypher Code Runner
+
+Long-lived process that executes tab code on behalf of the editor, keeping user
+code out of the editor's process. It only depends on the standard library so it
+can be started with any python interpreter.
+
+Requests are read from stdin as a header line followed by a payload:
+
+    `<op> <size> <name>\\n<size bytes of utf-8 source>`
+
+    `run` compiles and executes the source, `compile` only warms the code cache
+    and `reset` clears the namespace the code runs in.
+
+Everything the code prints is written to stdout, followed by the
+`RUN_SENTINEL` character and the elapsed time in nanoseconds on its own line once
+the run finishes, or -1 when the code didn't compile. Any `RUN_SENTINEL` the code
+prints itself is written as `SENTINEL_ESCAPE` instead, so it can't end the run early.
+
+* Update History
+
+    `2026-10-15` - Init.
+"""
+
+
+import builtins
+import functools
+import io
+import os
+import sys
+import time
+import types
+from pathlib import Path
+
+
+# Written after a run's output, followed by the elapsed nanoseconds
+RUN_SENTINEL = '\x1e'
+
+# Written in place of any RUN_SENTINEL in the output, the printable symbol for the character
+SENTINEL_ESCAPE = '\u241e'
+
+# Captured output is written to stdout once this many characters or seconds build up
+OUTPUT_CHUNK_SIZE = 4096
+OUTPUT_CHUNK_INTERVAL = 0.016
+
+# Printed lines are cut to this many characters, very long lines make the output widget crawl
+MAX_LINE_LENGTH = 4096
+TRUNCATED_MARKER = '…(truncated)'
+
+# Compiled code objects kept for reuse, the least recently run are dropped first
+CODE_CACHE_SIZE = 128
+
+# Optimization level tab code is compiled with. 0 runs the code as written, 1 and 2 strip asserts
+# (and 2 docstrings too) like `python -O`/`-OO`, which changes what the code does
+OPTIMIZE_LEVEL = 0
+
+# Bytecode of modules imported by tab code is cached here instead of in __pycache__ folders
+# next to the sources, unless PYTHONPYCACHEPREFIX already points somewhere else
+PYCACHE_PREFIX = Path.home() / '.cache' / 'cypher-pyc'
+
+
+class _OutputStream(io.TextIOBase):
+    """A stdout replacement that writes to the editor in batches."""
+    def __init__(self, raw: io.BufferedIOBase):
+        super().__init__()
+        self.raw = raw
+        self._buffer: list[str] = []
+        self._size: int = 0
+        self._line_length: int = 0  # Characters written since the last line break
+        self._last_flush: float = time.monotonic()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        if RUN_SENTINEL in text:
+            text = text.replace(RUN_SENTINEL, SENTINEL_ESCAPE)
+
+        if '\n' not in text and self._line_length + len(text) <= MAX_LINE_LENGTH:
+            self._line_length += len(text)
+            self._buffer.append(text)
+            self._size += len(text)
+        else:
+            self._write_cropped(text)
+
+        if self._size >= OUTPUT_CHUNK_SIZE or time.monotonic() - self._last_flush >= OUTPUT_CHUNK_INTERVAL:
+            self.flush()
+        return len(text)
+
+    def _write_cropped(self, text: str):
+        """Buffers the text, dropping the part of any line past MAX_LINE_LENGTH characters."""
+        for i, line in enumerate(text.split('\n')):
+            if i:
+                self._buffer.append('\n')
+                self._line_length = 0
+
+            room = MAX_LINE_LENGTH - self._line_length
+            if len(line) <= room:
+                self._buffer.append(line)
+            elif room >= 0:  # Only the first overflow of a line is marked, the rest is dropped
+                self._buffer.append(line[:room])
+                self._buffer.append(TRUNCATED_MARKER)
+            self._line_length += len(line)
+
+        self._size += len(text)
+
+    def flush(self):
+        if self._buffer:
+            self.raw.write(''.join(self._buffer).encode('utf-8', errors='replace'))
+            self.raw.flush()
+            self._buffer.clear()
+            self._size = 0
+        self._last_flush = time.monotonic()
+
+
+@functools.lru_cache(maxsize=CODE_CACHE_SIZE)
+def _compile_user(source: str, name: str) -> types.CodeType:
+    """
+    Compiles tab code, reusing the code object from a previous run when the
+    source and tab name haven't changed.
+
+    Args:
+        source: The python source to compile.
+
+        name: The tab name, used as the filename in tracebacks.
+
+    Returns:
+        types.CodeType: The compiled code object.
+    """
+    return compile(source, f'<tab:{name}>', 'exec', optimize=OPTIMIZE_LEVEL)
+
+
+class Runner(object):
+    def __init__(self, stdin: io.BufferedIOBase, stdout: io.BufferedIOBase):
+        self.stdin = stdin
+        self.stdout = stdout
+
+        # The namespace tab code runs in, kept between runs
+        self.namespace: dict = self.new_namespace()
+
+    @staticmethod
+    def new_namespace() -> dict:
+        """A fresh module namespace with the builtins bound up front."""
+        return {'__name__': '__main__', '__builtins__': builtins}
+
+    def run(self, source: str, name: str):
+        """Executes the source in the runner's namespace, printing any error it raises."""
+        # Each run's output starts on a new line in the cleared output widget
+        stream = _OutputStream(self.stdout)
+        sys.stdout = sys.stderr = stream
+        elapsed_ns = -1  # Nothing ran, so there is no time to report
+        try:
+            try:
+                code = _compile_user(source, name)
+            except (SyntaxError, ValueError) as e:
+                print(e)
+            else:
+                # Only the execution is timed, compiling is left out of the reported time
+                start_ns = time.perf_counter_ns()
+                try:
+                    exec(code, self.namespace)
+                except SystemExit:
+                    pass
+                except Exception as e:
+                    print(e)
+                except BaseException as e:
+                    # KeyboardInterrupt and the like would otherwise stop the runner and lose the namespace
+                    print(repr(e))
+                elapsed_ns = time.perf_counter_ns() - start_ns
+        finally:
+            sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+
+        stream.flush()
+        self.stdout.write(f'{RUN_SENTINEL}{elapsed_ns}\n'.encode('utf-8'))
+        self.stdout.flush()
+
+    def serve(self):
+        """Handles requests until the editor closes stdin."""
+        while True:
+            header = self.stdin.readline()
+            if not header:
+                return
+
+            op, size, name = header.decode('utf-8').rstrip('\n').split(' ', 2)
+            # Decoded here so a coding cookie in the tab can't change how the source is read
+            source = self.stdin.read(int(size)).decode('utf-8')
+
+            if op == 'run':
+                self.run(source, name)
+            elif op == 'compile':
+                try:
+                    _compile_user(source, name)
+                except (SyntaxError, ValueError):
+                    pass
+            elif op == 'reset':
+                self.namespace = self.new_namespace()
+
+
+def main():
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    # User code shouldn't consume the request stream, input() raises EOFError instead
+    sys.stdin = io.StringIO()
+    # Started as a script, so the path starts with the cypher package folder, where tab code would
+    # import the editor's own modules. The working directory is importable as it is in the editor
+    sys.path[0] = os.getcwd()
+    if sys.pycache_prefix is None:
+        sys.pycache_prefix = str(PYCACHE_PREFIX)
+    Runner(stdin, stdout).serve()
+
+
+if __name__ == '__main__':
+    main()
@@ -7,21 +7,53 @@
 """
 
 
-import os
+from collections import OrderedDict
 from pathlib import Path
+from typing import Optional
 
 from PySide2 import QtWidgets
 from PySide2 import QtGui
 from PySide2 import QtCore
 
+import cypher
 import cypher.languages.python_syntax
 import cypher.languages.json_syntax
 
 
+# Maximum number of prepared line number labels kept by each CodeEditor
+LINE_NUMBER_CACHE_SIZE = 1024
+
+# Files shown in the project tree, other files are hidden
+PROJECT_NAME_FILTERS = ['*.py', '*.pyx', '*.pyi', '*.txt', '*.md', '*.json']
+
+# Maximum number of threads used to write tabs back to disk
+SAVE_WORKERS = 8
+
+
+def _write_files(files: list[tuple[Path, str]]):
+    """
+    Writes each text to its path as UTF-8, using a pool of threads so the files
+    are saved concurrently. The text is written as-is with no newline translation.
+
+    Args:
+        files: The path and text content of each file to write.
+    """
+    if not files:
+        return
+
+    # Only needed when saving, so kept off the import path
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(SAVE_WORKERS, len(files))) as executor:
+        # Consume the results so any write error is raised here
+        list(executor.map(lambda file: file[0].write_bytes(file[1].encode('utf-8')), files))
+
+
 class LineNumberArea(QtWidgets.QWidget):
     def __init__(self, code_editor):
         super().__init__(code_editor)
         self.editor = code_editor
+        self.setAttribute(QtCore.Qt.WA_OpaquePaintEvent)
 
     def sizeHint(self):
         return QtCore.QSize(self.editor.line_number_area_width, 0)
@@ -38,117 +70,191 @@ class CodeEditor(QtWidgets.QPlainTextEdit):
     A line number widget is built into the side to tell you the current
     line number.
     """
-    indented = QtCore.Signal(range)
-    unindented = QtCore.Signal(range)
-
-    def __init__(self, path: Path):
+    def __init__(self, path: Path, max_highlight_size: Optional[int] = cypher.languages.json_syntax.MAX_HIGHLIGHT_SIZE):
         super(CodeEditor, self).__init__()
         self.file_path = path
+        self.highlighter = None
+        self.max_highlight_size = max_highlight_size
+        self.loading_size: Optional[int] = None
 
         self.setTabStopDistance(QtGui.QFontMetricsF(self.font()).horizontalAdvance(' ') * 4)
 
+        self._digit_width = self.fontMetrics().width('9')
+        self._line_number_area_width = 0
+        self._width_block_range = range(0)  # Block counts sharing the cached width
+        self._static_text_cache: OrderedDict[int, QtGui.QStaticText] = OrderedDict()
+
+        # Colors are fixed for the lifetime of the editor
+        self._line_number_bg_brush = QtGui.QBrush(QtGui.QColor(21, 21, 21))
+        self._line_number_pen = QtGui.QPen(QtCore.Qt.lightGray)
+        self._line_highlight_color = QtGui.QColor(QtCore.Qt.yellow).lighter(160)
+
+        self._current_line_selection = QtWidgets.QTextEdit.ExtraSelection()
+        self._current_line_selection.format.setBackground(self._line_highlight_color)
+        self._highlighted_block = -1
+
         self.line_number_area = LineNumberArea(self)
-        self._create_shortcut_signals()
         self._create_connections()
-        self.update_line_number_area_width(0)
-
-    def _create_shortcut_signals(self):
-        self.indented.connect(self.indent)
-        self.unindented.connect(self.unindent)
+        self.update_line_number_area_width(self.blockCount())
 
     def _create_connections(self):
-        self.connect(self, QtCore.SIGNAL('blockCountChanged(int)'), self.update_line_number_area_width)
-        self.connect(self, QtCore.SIGNAL('updateRequest(QRect,int)'), self.update_line_number_area)
-        self.connect(self, QtCore.SIGNAL('cursorPositionChanged()'), self.highlight_current_line)
+        self.blockCountChanged.connect(self.update_line_number_area_width)
+        self.updateRequest.connect(self.update_line_number_area)
+        self.cursorPositionChanged.connect(self.highlight_current_line)
 
     @property
     def line_number_area_width(self) -> int:
-        digits = 1
-        count = max(1, self.blockCount())
-        while count >= 10:
-            count /= 10
-            digits += 1
-        space = 20 + self.fontMetrics().width('9') * digits
-        return space
+        return self._line_number_area_width
+
+    def showEvent(self, e):
+        """Creates the syntax highlighter the first time the editor is shown."""
+        super().showEvent(e)
+        if self.highlighter is None:
+            if self.file_path.suffix == '.py':
+                self.highlighter = cypher.languages.python_syntax.PythonHighlighter(self.document())
+            elif self.file_path.suffix == '.json':
+                self.highlighter = cypher.languages.json_syntax.JsonHighlighter(self.document(),
+                                                                                 self.max_highlight_size)
+                self.highlighter.loading_size = self.loading_size
+
+    def set_max_highlight_size(self, size: Optional[int]):
+        """
+        Sets the document size above which JSON highlighting is skipped.
+
+        Args:
+            size: The maximum number of characters to highlight, None highlights documents of any size.
+        """
+        self.max_highlight_size = size
+        if isinstance(self.highlighter, cypher.languages.json_syntax.JsonHighlighter):
+            self.highlighter.set_max_highlight_size(size)
+
+    def set_loading_size(self, size: Optional[int]):
+        """
+        Sets the size the document will have once its file has been added in full, so
+        JSON highlighting is skipped or kept for the whole file rather than its first chunks.
 
-    def update_line_number_area_width(self, _):
-        self.setViewportMargins(self.line_number_area_width, 0, 0, 0)
+        Args:
+            size: The number of characters in the file, None once it has been loaded.
+        """
+        self.loading_size = size
+        if isinstance(self.highlighter, cypher.languages.json_syntax.JsonHighlighter):
+            self.highlighter.loading_size = size
+
+    def changeEvent(self, e):
+        super().changeEvent(e)
+        if e.type() == QtCore.QEvent.FontChange:
+            self._digit_width = self.fontMetrics().width('9')
+            self._width_block_range = range(0)
+            self._static_text_cache.clear()
+            self.update_line_number_area_width(self.blockCount())
+
+    @QtCore.Slot(int)
+    def update_line_number_area_width(self, block_count: int):
+        """
+        Resizes the line number margin, only recalculating the width when the
+        block count gains or loses a digit.
 
+        Args:
+            block_count: The current number of blocks in the document.
+        """
+        count = max(1, block_count)
+        if count in self._width_block_range:
+            return
+
+        digits = len(str(count))
+        self._width_block_range = range(10 ** (digits - 1), 10 ** digits)
+        self._line_number_area_width = 20 + self._digit_width * digits
+        self.setViewportMargins(self._line_number_area_width, 0, 0, 0)
+
+    @QtCore.Slot(QtCore.QRect, int)
     def update_line_number_area(self, rect, dy):
         if dy:
             self.line_number_area.scroll(0, dy)
         else:
             self.line_number_area.update(0, rect.y(), self.line_number_area.width(), rect.height())
 
-        if rect.contains(self.viewport().rect()):
-            self.update_line_number_area_width(0)
-
     def resizeEvent(self, e):
         super().resizeEvent(e)
         cr = self.contentsRect()
         self.line_number_area.setGeometry(QtCore.QRect(cr.left(), cr.top(), self.line_number_area_width, cr.height()))
 
+    def _line_number_text(self, number: int, painter: QtGui.QPainter) -> QtGui.QStaticText:
+        """
+        Returns the prepared static text for a line number, creating and
+        caching it on first use so the glyphs are only laid out once.
+
+        Args:
+            number: The line number to display.
+
+            painter: The painter the text will be drawn with.
+
+        Returns:
+            QtGui.QStaticText: The prepared line number label.
+        """
+        static_text = self._static_text_cache.get(number)
+        if static_text is not None:
+            self._static_text_cache.move_to_end(number)
+            return static_text
+
+        static_text = QtGui.QStaticText(str(number))
+        static_text.prepare(painter.transform(), self.font())
+        self._static_text_cache[number] = static_text
+        if len(self._static_text_cache) > LINE_NUMBER_CACHE_SIZE:
+            self._static_text_cache.popitem(last=False)
+        return static_text
+
     def line_number_area_paint_event(self, event):
         painter = QtGui.QPainter(self.line_number_area)
-        painter.fillRect(event.rect(), QtGui.QColor(21, 21, 21))
+        rect = event.rect()
+        painter.fillRect(rect, self._line_number_bg_brush)
+
+        # Values that stay constant for the whole paint are looked up once
+        rect_top = rect.top()
+        rect_bottom = rect.bottom()
+        block_bounding_rect = self.blockBoundingRect
+        line_number_text = self._line_number_text
+        draw_static_text = painter.drawStaticText
 
-        block = self.firstVisibleBlock()
+        # Without wrapping every block is a single line of the same height
+        fixed_height = self.lineWrapMode() == QtWidgets.QPlainTextEdit.NoWrap
+
+        # Start from the first block inside the dirty region rather than the top of the viewport
+        block = self.cursorForPosition(QtCore.QPoint(0, rect_top)).block()
         blockNumber = block.blockNumber()
         top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
-        bottom = top + self.blockBoundingRect(block).height()
+        height = block_bounding_rect(block).height()
+        bottom = top + height
 
-        height = self.fontMetrics().height()
-        while block.isValid() and (top <= event.rect().bottom()):
-            if block.isVisible() and (bottom >= event.rect().top()):
-                number = str(blockNumber + 1)
-                painter.setPen(QtCore.Qt.lightGray)
-                painter.drawText(0, top, self.line_number_area.width(), height, QtCore.Qt.AlignLeft, number)
+        painter.setFont(self.font())
+        painter.setPen(self._line_number_pen)
+        while block.isValid() and (top <= rect_bottom):
+            if block.isVisible() and (bottom >= rect_top):
+                number = line_number_text(blockNumber + 1, painter)
+                draw_static_text(0, int(top), number)
 
             block = block.next()
             top = bottom
-            bottom = top + self.blockBoundingRect(block).height()
+            if not fixed_height:
+                height = block_bounding_rect(block).height()
+            bottom = top + height
             blockNumber += 1
 
+    @QtCore.Slot()
     def highlight_current_line(self):
+        # Moving within the same line doesn't change the highlight
+        block_number = self.textCursor().blockNumber()
+        if block_number == self._highlighted_block:
+            return
+        self._highlighted_block = block_number
+
         extraSelections = []
         if not self.isReadOnly():
-            selection = QtWidgets.QTextEdit.ExtraSelection()
-
-            lineColor = QtGui.QColor(QtCore.Qt.yellow).lighter(160)
-
-            selection.format.setBackground(lineColor)
+            selection = self._current_line_selection
             selection.cursor = self.textCursor()
             selection.cursor.clearSelection()
             extraSelections.append(selection)
         self.setExtraSelections(extraSelections)
 
-    def add_line_prefix(self, prefix: str, line: int):
-        """
-        Adds the prefix substring to the start of a line.
-
-        Args:
-            prefix: The substring to append to the start of the line.
-            line: The line number to append.
-        """
-        cursor = QtGui.QTextCursor(self.document().findBlockByLineNumber(line))
-        self.setTextCursor(cursor)
-        self.textCursor().insertText(prefix)
-
-    def remove_line_prefix(self, prefix: str, line: int):
-        """
-        Removes the prefix substring from the start of a line.
-
-        Args:
-            prefix: The substring to remove from the start of the line.
-            line: The line number to adjust.
-        """
-        cursor = QtGui.QTextCursor(self.document().findBlockByLineNumber(line))
-        cursor.select(QtGui.QTextCursor.LineUnderCursor)
-        text = cursor.selectedText()
-        if text.startswith(prefix):
-            cursor.removeSelectedText()
-            cursor.insertText(text.split(prefix, 1)[-1])
-
     def _get_selection_range(self) -> tuple[int, int]:
         """
         Returns the first and last line of a continuous selection.
@@ -170,33 +276,64 @@ class CodeEditor(QtWidgets.QPlainTextEdit):
 
         return first_line, last_line
 
+    @QtCore.Slot(object)
     def indent(self, lines: range):
-        """Indent the lines within the given range."""
-        for i in lines:
-            self.add_line_prefix('\t', i)
+        """Indent the lines within the given range as a single undo step."""
+        cursor = self.textCursor()
+        cursor.beginEditBlock()
+        # Step through the blocks rather than looking each line up from the start of the document
+        block = self.document().findBlockByNumber(lines.start)
+        for _ in lines:
+            cursor.setPosition(block.position())
+            cursor.insertText('\t')
+            block = block.next()
+        cursor.endEditBlock()
 
+    @QtCore.Slot(object)
     def unindent(self, lines: range):
-        """Unindent the lines within the given range."""
-        for i in lines:
-            self.remove_line_prefix('\t', i)
+        """Unindent the lines within the given range as a single undo step."""
+        cursor = self.textCursor()
+        cursor.beginEditBlock()
+        block = self.document().findBlockByNumber(lines.start)
+        for _ in lines:
+            if block.text().startswith('\t'):
+                cursor.setPosition(block.position())
+                cursor.deleteChar()
+            block = block.next()
+        cursor.endEditBlock()
 
     def keyPressEvent(self, e):
         """Enable shortcuts in keypress event."""
-        first_line, last_line = self._get_selection_range()
+        key = e.key()
 
-        if e.key() == QtCore.Qt.Key_Tab and last_line - first_line:
-            lines = range(first_line, last_line + 1)
-            self.indented.emit(lines)
-            return
+        # Only the indent shortcuts need the selected lines
+        if key == QtCore.Qt.Key_Tab or key == QtCore.Qt.Key_Backtab:
+            first_line, last_line = self._get_selection_range()
 
-        if e.key() == QtCore.Qt.Key_Backtab:
-            lines = range(first_line, last_line + 1)
-            self.unindented.emit(lines)
-            return
+            if key == QtCore.Qt.Key_Tab and last_line - first_line:
+                self.indent(range(first_line, last_line + 1))
+                return
+
+            if key == QtCore.Qt.Key_Backtab:
+                self.unindent(range(first_line, last_line + 1))
+                return
 
         super(CodeEditor, self).keyPressEvent(e)
 
 
+class TabSlot(object):
+    """The editor widget and file path of an open tab."""
+    __slots__ = ('widget', 'path', 'posix', 'loading')
+
+    def __init__(self, widget: CodeEditor, path: Path):
+        self.widget = widget
+        self.path = path
+        # Cached as it's used as the key when saving the session
+        self.posix = path.as_posix()
+        # Set while the file is still being added to the widget, its text is incomplete until then
+        self.loading = False
+
+
 class EditorTabWidget(QtWidgets.QTabWidget):
     """
     A tab handler for CodeEditor() tabs.
@@ -207,15 +344,16 @@ class EditorTabWidget(QtWidgets.QTabWidget):
     def __init__(self):
         super().__init__()
 
-        self.tabs: list[CodeEditor] = list()
-        self.tab_paths: list[Path] = list()
+        self.slots: list[TabSlot] = list()
+        self._path_to_index: dict[Path, int] = dict()
+        self.max_highlight_size = cypher.languages.json_syntax.MAX_HIGHLIGHT_SIZE
         self.current_index = 0
         self.old_index = 0
 
         self.setTabsClosable(True)
         self.tabCloseRequested.connect(self.remove_tab)
 
-    def insert_code_tab(self, index: int, path: Path, command: str = ''):
+    def insert_code_tab(self, index: int, path: Path, command: str = '', make_current: bool = True) -> int:
         """
         Inserts a tab at the given index named after the given label.
         Can be given a command if loading text from a file.
@@ -226,100 +364,187 @@ class EditorTabWidget(QtWidgets.QTabWidget):
             path: The path to the file to create the tab from.
 
             command: Any pre-written python code to add.
+
+            make_current: Whether to switch to the tab once it is inserted.
+
+        Returns:
+            int: The index of the tab, which is the existing one if the path was already open.
         """
-        if path in self.tab_paths:
-            self.setCurrentIndex(self.tab_paths.index(path))
-            return
+        existing_index = self._path_to_index.get(path)
+        if existing_index is not None:
+            if make_current:
+                self.setCurrentIndex(existing_index)
+            return existing_index
 
-        tab = CodeEditor(path)
+        tab = CodeEditor(path, self.max_highlight_size)
         tab.setPlainText(command)
+        # The text matches the file, there is nothing to save until it is edited
+        tab.document().setModified(False)
 
-        if path.suffix == '.py':
-            cypher.languages.python_syntax.PythonHighlighter(tab.document())
-        elif path.suffix == '.json':
-            cypher.languages.json_syntax.JsonHighlighter(tab.document())
+        index = self.insertTab(index, tab, path.name)
+        self.slots.insert(index, TabSlot(tab, path))
+        self._shift_path_indexes(index, 1)
+        self._path_to_index[path] = index
 
-        self.insertTab(index, tab, path.name)
-        self.tabs.insert(index, tab)
-        self.tab_paths.insert(index, path)
+        if make_current:
+            self.setCurrentIndex(index)
+        return index
 
-        self.setCurrentIndex(index)
+    def insert_many(self, specs: list[tuple[int, Path, str]]):
+        """
+        Inserts several code tabs with repainting suspended until all are added.
+        Only the last tab is switched to, so the others aren't shown (and highlighted)
+        until they are selected.
 
+        Args:
+            specs: The index, path and command of each tab, as passed to insert_code_tab().
+        """
+        self.setUpdatesEnabled(False)
+        try:
+            index = None
+            for spec in specs:
+                index = self.insert_code_tab(*spec, make_current=False)
+            if index is not None:
+                self.setCurrentIndex(index)
+        finally:
+            self.setUpdatesEnabled(True)
+            self.update()
+
+    @QtCore.Slot(int)
     def remove_tab(self, index: int):
-        self.tab_paths.pop(index)
-        self.tabs.pop(index)
+        slot = self.slots.pop(index)
         self.removeTab(index)
+        del self._path_to_index[slot.path]
+        self._shift_path_indexes(index, -1)
+
+    def _shift_path_indexes(self, start: int, offset: int):
+        """
+        Offsets the stored index of every tab at or after the given index.
+
+        Args:
+            start: The first tab index to shift.
+
+            offset: The amount to move each affected index by.
+        """
+        for path, index in self._path_to_index.items():
+            if index >= start:
+                self._path_to_index[path] = index + offset
+
+    def path_index(self, path: Path) -> int:
+        """
+        Args:
+            path: The file path to look up.
+
+        Returns:
+            int: The index of the tab open on the path, or -1 if it isn't open.
+        """
+        return self._path_to_index.get(path, -1)
+
+    def set_max_highlight_size(self, size: Optional[int]):
+        """
+        Sets the document size above which JSON highlighting is skipped, for open and new tabs.
+
+        Args:
+            size: The maximum number of characters to highlight, None highlights documents of any size.
+        """
+        self.max_highlight_size = size
+        for slot in self.slots:
+            slot.widget.set_max_highlight_size(size)
+
+    def _modified_slots(self) -> list[TabSlot]:
+        """
+        Returns:
+            list[TabSlot]: The tabs edited since they were opened or last saved. Tabs still
+            loading are read-only and only hold part of their file, so they are left out.
+        """
+        return [slot for slot in self.slots if not slot.loading and slot.widget.document().isModified()]
+
+    @staticmethod
+    def _save_slots(slots: list[TabSlot]):
+        """
+        Writes the text of each tab to its file and marks the tabs as saved.
+
+        Args:
+            slots: The tabs to save.
+        """
+        # Text is read on the GUI thread, only the disk writes are threaded
+        _write_files([(slot.path, slot.widget.toPlainText()) for slot in slots])
+        for slot in slots:
+            slot.widget.document().setModified(False)
 
     def save_files(self):
-        for i, p in enumerate(self.tab_paths):
-            with open(p, 'w') as out_file:
-                out_file.write(self.tabs[i].toPlainText())
+        self._save_slots(self._modified_slots())
 
     def close_all_tabs(self, save: bool = False):
-        for i, p in enumerate(self.tab_paths):
-            if save:
-                with open(p, 'w') as out_file:
-                    out_file.write(self.tabs[i].toPlainText())
-            self.remove_tab(i)
+        # Written before any tab is removed, so a failed write leaves the edits open
+        if save:
+            self._save_slots(self._modified_slots())
+
+        slots = self.slots
+        self.slots = list()
+        self._path_to_index.clear()
+        with cypher.updates_suspended(self):
+            self.clear()
+
+        for slot in slots:
+            slot.widget.deleteLater()
+
 
+class _ProjectModel(QtWidgets.QFileSystemModel):
+    """A file system model whose name column is labelled after the project folder."""
+    def __init__(self, parent: QtCore.QObject = None):
+        super().__init__(parent)
+        self.label = 'Project'
 
-class FolderTree(QtWidgets.QTreeWidget):
+    def headerData(self, section: int, orientation: QtCore.Qt.Orientation, role: int = QtCore.Qt.DisplayRole):
+        if section == 0 and orientation == QtCore.Qt.Horizontal and role == QtCore.Qt.DisplayRole:
+            return self.label
+        return super().headerData(section, orientation, role)
+
+
+class FolderTree(QtWidgets.QTreeView):
     """A tree of files/folders for project navigation."""
     def __init__(self, parent: QtWidgets.QMainWindow):
         super().__init__()
         self.parent = parent
         self.root_path = Path()
-        self.setHeaderLabel('Project')
+        # Created on the first refresh, an unrooted model would list the whole file system
+        self._model = None
 
-        self.itemClicked.connect(self.clicked_connection)
+        self.clicked.connect(self.clicked_connection)
+
+    def _create_model(self) -> _ProjectModel:
+        model = _ProjectModel(self)
+        model.setNameFilters(PROJECT_NAME_FILTERS)
+        model.setNameFilterDisables(False)  # Hide filtered files rather than greying them out
+        return model
 
     def refresh_tree(self, path: Path):
         """
-        Redraws the tree from the given path.
+        Shows the given folder in the tree. Qt lists each folder on a background
+        thread the first time it is expanded and keeps it up to date with changes
+        on disk, so nothing is walked up front and showing the current folder
+        again is a no-op.
 
         Args:
-            path: Which folder to recursively populate the tree from.
-        """
-        self.clear()
-        self.root_path = path
-        invis_root_node = self.invisibleRootItem()
-        if path.is_dir():
-            root_label = path.name
-        else:
-            root_label = path.parent.name
-        root_node = QtWidgets.QTreeWidgetItem(invis_root_node, [root_label])
-        root_node.setExpanded(True)
-        self._refresh_tree(path, root_node)
-
-    def _refresh_tree(self, path: Path, tree: QtWidgets.QTreeWidgetItem):
+            path: Which folder to populate the tree from.
         """
-        Recursively create a tree of QTreeWidgetItems to add to the tree widget.
-
-        Args:
-            path: The current folder/file to create a node from.
+        if self._model is not None and path == self.root_path:
+            return
 
-            tree: The new parent to add children to.
-        """
-        for i in os.listdir(path.as_posix()):
-            new_path = Path(path, i)
-            parent_item = QtWidgets.QTreeWidgetItem(tree, [new_path.name])
+        if self._model is None:
+            self._model = self._create_model()
+            self.setModel(self._model)
+            # Only the name column is shown
+            for column in range(1, self._model.columnCount()):
+                self.hideColumn(column)
 
-            if new_path.is_dir():
-                parent_item.setIcon(0, QtGui.QIcon('SP_DirIcon'))
-                self._refresh_tree(new_path, parent_item)
-            else:
-                parent_item.setIcon(0, QtGui.QIcon('SP_FileIcon'))
+        self.root_path = path
+        self._model.label = path.name
+        self._model.headerDataChanged.emit(QtCore.Qt.Horizontal, 0, 0)
+        self.setRootIndex(self._model.setRootPath(path.as_posix()))
 
-    def clicked_connection(self, item, _):
+    @QtCore.Slot(QtCore.QModelIndex)
+    def clicked_connection(self, index: QtCore.QModelIndex):
         """When an item is clicked, tell the main window to create a tab from it."""
-        rel_path = self._build_item_path(item, Path())
-        full_path = Path(self.root_path, rel_path)
-        self.parent.open_file_in_tab(full_path)
-
-    def _build_item_path(self, item: QtWidgets.QTreeWidgetItem, cur_path: Path) -> Path:
-        t_path = Path(item.text(0), cur_path)
-        if item.parent():
-            next_path = self._build_item_path(item.parent(), t_path)
-            return next_path
-        else:
-            return cur_path
+        self.parent.open_file_in_tab(Path(self._model.filePath(index)))
@@ -8,37 +8,145 @@
 
 
 import os
-import contextlib
-import json
+import codecs
 import sys
-import time
-import webbrowser
-from io import StringIO
 from pathlib import Path
+from typing import Optional
 
 from PySide2 import QtCore
 from PySide2 import QtWidgets
 from PySide2 import QtGui
 
 import cypher
+from cypher._runner import RUN_SENTINEL
+from cypher.components import CodeEditor
 from cypher.components import EditorTabWidget
 from cypher.components import FolderTree
+from cypher.languages.json_syntax import MAX_HIGHLIGHT_SIZE
 
 
 MODULE_PATH = Path(__file__).parent
 SESSION_DATA_PATH = Path(MODULE_PATH, 'session_data.json')
-RESOURCE_PATH = Path(Path(__file__).parent, 'resources')
+RUNNER_PATH = Path(MODULE_PATH, '_runner.py')
+RESOURCE_PATH = Path(MODULE_PATH, 'resources')
 QtCore.QDir.addSearchPath('ICONS', RESOURCE_PATH.as_posix())
 
 
-class TabData(object):
-    def __init__(self, index: int, path: Path, active: bool):
-        self.index = index
+# Lines kept in the output widget, older lines are dropped once this is exceeded
+OUTPUT_MAX_BLOCKS = 5000
+
+# Window settings are kept in the platform's native store, the registry on Windows
+SETTINGS_ORGANIZATION = 'Cypher'
+SETTINGS_APPLICATION = 'Editor'
+
+# Milliseconds to wait after a splitter stops moving before saving the window settings
+SETTINGS_SAVE_DELAY = 2000
+
+# Files longer than this many characters are added to their tab in chunks of about this size
+LARGE_FILE_CHUNK_SIZE = 65_536
+
+# Maximum number of threads used to read the previous session's files
+LOAD_WORKERS = 8
+
+
+def _open_settings() -> QtCore.QSettings:
+    return QtCore.QSettings(QtCore.QSettings.NativeFormat, QtCore.QSettings.UserScope,
+                            SETTINGS_ORGANIZATION, SETTINGS_APPLICATION)
+
+
+def _existing_files(paths: list[str]) -> list[str]:
+    """
+    Filters out paths that no longer exist, listing each parent directory once
+    rather than stat-ing every file.
+
+    Args:
+        paths: The file paths to check.
+
+    Returns:
+        list[str]: The paths that exist, in their original order.
+    """
+    listings: dict[str, set[str]] = {}
+    existing = []
+    for path in paths:
+        parent, name = os.path.split(path)
+        names = listings.get(parent)
+        if names is None:
+            try:
+                names = listings[parent] = set(os.listdir(parent or '.'))
+            except OSError:
+                names = listings[parent] = set()
+        if name in names:
+            existing.append(path)
+
+    return existing
+
+
+def _read_file_or_none(path: Path) -> Optional[str]:
+    try:
+        return cypher.read_text(path)
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def _read_files(paths: list[Path]) -> list[Optional[str]]:
+    """
+    Reads each path as UTF-8 using a pool of threads so the files are read
+    concurrently. Line endings are left untranslated.
+
+    Args:
+        paths: The file paths to read.
+
+    Returns:
+        list[Optional[str]]: The content of each file, in the same order as paths,
+        None for files that couldn't be read or aren't UTF-8.
+    """
+    if not paths:
+        return []
+
+    # Only needed when there is a session to restore, so kept off the import path
+    import concurrent.futures
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(LOAD_WORKERS, len(paths))) as executor:
+        return list(executor.map(_read_file_or_none, paths))
+
+
+def _chunk_end(text: str, start: int) -> int:
+    """
+    Args:
+        text: The text being split into chunks.
+
+        start: Where the chunk starts in the text.
+
+    Returns:
+        int: The end of the chunk, after the last line break within LARGE_FILE_CHUNK_SIZE
+        characters where there is one.
+    """
+    end = start + LARGE_FILE_CHUNK_SIZE
+    if end >= len(text):
+        return len(text)
+    line_end = text.rfind('\n', start, end)
+    return line_end + 1 if line_end != -1 else end
+
+
+class _ReadRunnable(QtCore.QRunnable):
+    """Reads a file on the thread pool and hands its text back to the editor."""
+    def __init__(self, path: Path, editor: 'CypherEditor'):
+        super().__init__()
         self.path = path
-        self.active = active
+        self.editor = editor
+
+    def run(self):
+        try:
+            text = cypher.read_text(self.path)
+        except (OSError, UnicodeDecodeError):
+            text = None
+        # The editor lives on the GUI thread, so this is delivered as a queued call
+        self.editor.file_read.emit(self.path, text)
 
 
 class CypherEditor(QtWidgets.QMainWindow):
+    file_read = QtCore.Signal(object, object)
+
     def __init__(self):
         super(CypherEditor, self).__init__()
 
@@ -48,14 +156,22 @@ class CypherEditor(QtWidgets.QMainWindow):
         self.setWindowIcon(QtGui.QIcon(Path(RESOURCE_PATH, 'ICON_CypherSimple_1024.png').as_posix()))
         cypher.set_stylesheet(self)
 
-        self.settings_path = Path(os.getenv('USERPROFILE'), f'{self.windowTitle()}WindowSettingsFile.ini')
+        # Tab code is run in a separate process started with this interpreter
+        self.interpreter = str(_open_settings().value('interpreter', sys.executable))
+        self._runner: Optional[QtCore.QProcess] = None
+        self._runner_buffer: bytes = b''
+        self._runner_decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._running: bool = False
+        # Set once the previous session has been loaded after the first show
+        self._restored: bool = False
+        # Set once the splitters are sized, either from the previous session or on the first show
+        self._splitters_sized: bool = False
 
         self._create_widgets()
         self._create_layout()
         self._create_menu_actions()
         self._create_menu_bar()
         self._create_connections()
-        self._load_previous_session_data()
         self._restore_window_settings()
 
     def _create_widgets(self):
@@ -65,6 +181,8 @@ class CypherEditor(QtWidgets.QMainWindow):
         # Action buttons
         self.hlayout_buttons = QtWidgets.QHBoxLayout()
         self.btn_run = QtWidgets.QPushButton('Run')
+        self.btn_cancel = QtWidgets.QPushButton('Cancel')
+        self.btn_cancel.setEnabled(False)
 
         # Tab manager
         self.tab_manager = EditorTabWidget()
@@ -77,12 +195,20 @@ class CypherEditor(QtWidgets.QMainWindow):
         self.vlayout_output = QtWidgets.QVBoxLayout()
         self.lbl_output = QtWidgets.QLabel('Output')
         self.lbl_output.setAlignment(QtCore.Qt.AlignLeft)
-        self.tb_output = QtWidgets.QTextBrowser()
+        self.tb_output = QtWidgets.QPlainTextEdit()
+        self.tb_output.setReadOnly(True)
+        self.tb_output.setUndoRedoEnabled(False)
+        self.tb_output.setMaximumBlockCount(OUTPUT_MAX_BLOCKS)
 
         # Splitters
         self.code_output_splitter = QtWidgets.QSplitter(QtCore.Qt.Vertical)
         self.file_editor_splitter = QtWidgets.QSplitter(QtCore.Qt.Horizontal)
 
+        # Coalesces splitter moves into a single settings write
+        self.settings_timer = QtCore.QTimer(self)
+        self.settings_timer.setSingleShot(True)
+        self.settings_timer.setInterval(SETTINGS_SAVE_DELAY)
+
     def _create_layout(self):
         self.setCentralWidget(self.widget_main)
         self.widget_main.setLayout(self.layout_main)
@@ -90,6 +216,7 @@ class CypherEditor(QtWidgets.QMainWindow):
         # Action buttons
         self.hlayout_buttons.addStretch()
         self.hlayout_buttons.addWidget(self.btn_run)
+        self.hlayout_buttons.addWidget(self.btn_cancel)
 
         # Output
         self.output_widget.setLayout(self.vlayout_output)
@@ -99,12 +226,8 @@ class CypherEditor(QtWidgets.QMainWindow):
         # Splitters
         self.code_output_splitter.addWidget(self.tab_manager)
         self.code_output_splitter.addWidget(self.output_widget)
-        self.code_output_splitter.setSizes(
-            [self.code_output_splitter.size().height() * .7, self.code_output_splitter.size().height() * .3])
         self.file_editor_splitter.addWidget(self.file_manager)
         self.file_editor_splitter.addWidget(self.code_output_splitter)
-        self.file_editor_splitter.setSizes(
-            [self.file_editor_splitter.size().width() * .2, self.file_editor_splitter.size().width() * .8])
 
         # Main
         self.layout_main.addLayout(self.hlayout_buttons)
@@ -113,6 +236,9 @@ class CypherEditor(QtWidgets.QMainWindow):
     def _create_menu_actions(self):
         self.action_open_folder = QtWidgets.QAction('Open Folder', self)
         self.action_save_files = QtWidgets.QAction('Save Files', self)
+        self.action_reset_namespace = QtWidgets.QAction('Reset Namespace', self)
+        self.action_highlight_large_files = QtWidgets.QAction('Highlight Large Files', self)
+        self.action_highlight_large_files.setCheckable(True)
         self.action_about = QtWidgets.QAction('About', self)
 
     def _create_menu_bar(self):
@@ -123,172 +249,478 @@ class CypherEditor(QtWidgets.QMainWindow):
         file_menu.addAction(self.action_open_folder)
         file_menu.addAction(self.action_save_files)
 
+        view_menu = QtWidgets.QMenu('View', self)
+        menu_bar.addMenu(view_menu)
+        view_menu.addAction(self.action_highlight_large_files)
+
+        run_menu = QtWidgets.QMenu('Run', self)
+        menu_bar.addMenu(run_menu)
+        run_menu.addAction(self.action_reset_namespace)
+
         help_menu = QtWidgets.QMenu('Help', self)
         menu_bar.addMenu(help_menu)
         help_menu.addAction(self.action_about)
 
     def _create_connections(self):
         self.btn_run.clicked.connect(self.run_code)
+        self.btn_cancel.clicked.connect(self.cancel_run)
         self.action_open_folder.triggered.connect(self.open_project)
         self.action_save_files.triggered.connect(self.save_files)
+        self.action_reset_namespace.triggered.connect(self.reset_namespace)
+        self.action_highlight_large_files.toggled.connect(self.set_large_file_highlighting)
         self.action_about.triggered.connect(self.open_about)
+        self.code_output_splitter.splitterMoved.connect(self._schedule_settings_save)
+        self.file_editor_splitter.splitterMoved.connect(self._schedule_settings_save)
+        self.settings_timer.timeout.connect(self._save_window_settings)
+        self.file_read.connect(self._open_read_file)
 
-    def closeEvent(self, event):
+    def showEvent(self, event: QtGui.QShowEvent):
+        """
+        Overrides the show event to size the splitters once the window has its real
+        size, and to load the previous session once the window has painted.
+        """
+        super(CypherEditor, self).showEvent(event)
+        if not self._splitters_sized:
+            self._size_splitters()
+        if not self._restored:
+            QtCore.QTimer.singleShot(0, self._post_show_init)
+
+    def _size_splitters(self):
+        """Splits the editor 70/30 with the output and 20/80 with the file tree."""
+        height = self.code_output_splitter.height()
+        self.code_output_splitter.setSizes([height * 7 // 10, height - height * 7 // 10])
+        width = self.file_editor_splitter.width()
+        self.file_editor_splitter.setSizes([width // 5, width - width // 5])
+        self._splitters_sized = True
+
+    @QtCore.Slot()
+    def _post_show_init(self):
+        """
+        Restores the file tree and the previous session's tabs and starts the runner,
+        deferred so the window shows first.
+        """
+        if self._restored:
+            return
+        self._restored = True
+        self._restore_file_tree()
+        self._load_previous_session_data()
+        if self._runner is None:
+            self._start_runner()
+
+    def closeEvent(self, event: QtGui.QCloseEvent):
         """Overrides the close tool event to save the tabs and geometry."""
-        self._save_session_data()
+        self._stop_runner()
+        # Saving before the session was loaded would overwrite it with no tabs
+        if self._restored:
+            self._save_session_data()
+        self.settings_timer.stop()
         self._save_window_settings()
         super(CypherEditor, self).closeEvent(event)
 
+    @QtCore.Slot()
+    def _schedule_settings_save(self):
+        self.settings_timer.start()
+
+    @QtCore.Slot()
     def _save_window_settings(self):
         """Save the window settings, such as window size, splitter placement, etc."""
-        settings_ini = QtCore.QSettings(self.settings_path.as_posix(), QtCore.QSettings.IniFormat)
+        settings = _open_settings()
+        settings.beginGroup('session')
 
         # Main window
-        settings_ini.setValue('windowGeometry', self.saveGeometry())
+        settings.setValue('windowGeometry', self.saveGeometry())
 
         # Splitters
-        settings_ini.setValue('codeSplitterSettings', self.code_output_splitter.saveState())
-        settings_ini.setValue('fileSplitterSettings', self.file_editor_splitter.saveState())
+        settings.setValue('codeSplitterSettings', self.code_output_splitter.saveState())
+        settings.setValue('fileSplitterSettings', self.file_editor_splitter.saveState())
 
-        # File tree
-        settings_ini.setValue('fileTreePath', self.file_manager.root_path.as_posix())
+        # File tree, only known once the previous one has been restored
+        if self._restored:
+            settings.setValue('fileTreePath', self.file_manager.root_path.as_posix())
+
+        settings.endGroup()
+        settings.sync()
 
     def _restore_window_settings(self):
         """Restore the window settings, such as window size, splitter placement, etc."""
+        settings = _open_settings()
+        settings.beginGroup('session')
+
         # Restore previous session geometry
-        if self.settings_path.exists():
-            settings_data = QtCore.QSettings(self.settings_path.as_posix(), QtCore.QSettings.IniFormat)
+        if settings.contains('windowGeometry'):
+            with cypher.updates_suspended(self):
+                # Main window
+                self.restoreGeometry(settings.value('windowGeometry'))
 
-            # Main window
-            self.restoreGeometry(settings_data.value('windowGeometry'))
+                # Splitters
+                code_restored = self.code_output_splitter.restoreState(settings.value('codeSplitterSettings'))
+                file_restored = self.file_editor_splitter.restoreState(settings.value('fileSplitterSettings'))
+                self._splitters_sized = code_restored and file_restored
 
-            # Splitters
-            self.code_output_splitter.restoreState(settings_data.value('codeSplitterSettings'))
-            self.file_editor_splitter.restoreState(settings_data.value('fileSplitterSettings'))
+        settings.endGroup()
 
-            # File tree
-            tree_path = Path(str(settings_data.value('fileTreePath')))
+    def _restore_file_tree(self):
+        """Shows the previous session's folder in the file tree."""
+        settings = _open_settings()
+        settings.beginGroup('session')
+
+        if settings.contains('fileTreePath'):
+            tree_path = Path(str(settings.value('fileTreePath')))
             if tree_path.exists():
                 self.file_manager.refresh_tree(tree_path)
 
+        settings.endGroup()
+
     def _save_session_data(self):
         """Save all currently open tab values."""
-        tab_data = []
-        active_index = self.tab_manager.currentIndex()
-
-        for i in range(self.tab_manager.count()):
-            tab = self.tab_manager.tabs[i]
-            path = self.tab_manager.tab_paths[i]
-            active = active_index == i
+        import json
 
-            data = TabData(i, path, active)
-            tab_data.append(data)
+        active_index: int = self.tab_manager.currentIndex()
+        write_data: dict[str, dict] = {slot.posix: {'index': i, 'active': i == active_index}
+                                       for i, slot in enumerate(self.tab_manager.slots)}
 
-        self.tab_manager.setCurrentIndex(active_index)  # Restore previous active tab
-
-        write_data = {}
-        for data in tab_data:
-            val = data.__dict__
-            path = val.pop('path')
-            write_data[path.as_posix()] = val
-
-        with open(SESSION_DATA_PATH, 'w') as f:
-            json.dump(write_data, f, indent=4)
+        SESSION_DATA_PATH.write_bytes(json.dumps(write_data, separators=(',', ':')).encode('utf-8'))
 
     def _load_previous_session_data(self):
         """Load the previous session's tabs and their contents."""
-        if not SESSION_DATA_PATH.exists():
-            return
+        import json
 
-        with open(SESSION_DATA_PATH, 'r') as f:
-            tab_data = json.load(f)
+        try:
+            tab_data: dict[str, dict] = json.loads(SESSION_DATA_PATH.read_bytes())
+        except FileNotFoundError:
+            return
 
         if not tab_data:
             return
 
-        active_index = 0
-        for path, values in tab_data.items():
-            file = Path(path)
-            if not file.exists():
+        keys = _existing_files(list(tab_data))
+        files = [Path(key) for key in keys]
+        contents = _read_files(files)
+
+        active_index: int = 0
+        specs: list[tuple[int, Path, str]] = []
+        for key, file, command in zip(keys, files, contents):
+            # Directories and files that were removed, can't be read or aren't UTF-8 are skipped
+            if command is None:
                 continue
-            with open(file.as_posix(), 'r') as f:
-                command = f.read()
-            self.tab_manager.insert_code_tab(values['index'], Path(path), command)
+            values = tab_data[key]
+            specs.append((values['index'], file, command))
             if values['active']:
                 active_index = values['index']
 
+        self.tab_manager.insert_many(specs)
         self.tab_manager.setCurrentIndex(active_index)
 
+        # Warm the compile cache once the window is idle so the first run is faster
+        QtCore.QTimer.singleShot(0, self._precompile_tabs)
+
+    @QtCore.Slot()
+    def _precompile_tabs(self):
+        """Has the runner compile the code of every open python tab ahead of the first run."""
+        for i, slot in enumerate(self.tab_manager.slots):
+            if slot.path.suffix == '.py':
+                self._send_to_runner('compile', slot.widget.toPlainText(), self.tab_manager.tabText(i))
+
     def open_file_in_tab(self, path: Path):
         """
         When the user clicks a file in the folder tree widget, read
         the contents of the file, then tell the tab manager to insert
         a new tab with the contents of the file as the displayed command.
+        The file is read on a background thread, files that are already
+        open are switched to without reading them again.
 
         Args:
             path: Path to the file to open.
         """
+        index = self.tab_manager.path_index(path)
+        if index != -1:
+            self.tab_manager.setCurrentIndex(index)
+            return
+
         if path.is_file():
-            try:
-                with open(path.as_posix(), 'r') as f:
-                    contents = f.read()
-                    self.tab_manager.insert_code_tab(self.tab_manager.count(), path, contents)
-            except FileNotFoundError:
-                print('File not found or inaccessible.')
+            QtCore.QThreadPool.globalInstance().start(_ReadRunnable(path, self))
+
+    @QtCore.Slot(object, object)
+    def _open_read_file(self, path: Path, text: Optional[str]):
+        """
+        Inserts a tab for a file read by open_file_in_tab(). Large files get their
+        first chunk straight away and the rest is appended while the GUI stays idle.
+
+        Args:
+            path: The file that was read.
+
+            text: The contents of the file, None if it couldn't be read.
+        """
+        if text is None:
+            print('File not found, inaccessible or not UTF-8.')
+            return
+
+        # The file may have been opened again while it was being read
+        index = self.tab_manager.path_index(path)
+        if index != -1:
+            self.tab_manager.setCurrentIndex(index)
+            return
+
+        end = _chunk_end(text, 0)
+        index = self.tab_manager.insert_code_tab(self.tab_manager.count(), path, text[:end])
+        if end < len(text):
+            slot = self.tab_manager.slots[index]
+            tab = slot.widget
+            # Appending the chunks shouldn't be undoable, and a partly loaded tab can't be edited or saved
+            tab.document().setUndoRedoEnabled(False)
+            tab.setReadOnly(True)
+            tab.set_loading_size(len(text))
+            slot.loading = True
+            QtCore.QTimer.singleShot(0, lambda: self._append_file_chunk(tab, text, end))
+
+    def _append_file_chunk(self, tab: CodeEditor, text: str, start: int):
+        """
+        Appends the next chunk of a large file to its tab, scheduling the chunk after it.
+
+        Args:
+            tab: The editor the file was opened in.
+
+            text: The full contents of the file.
+
+            start: Where the chunk starts in the text.
+        """
+        index = self.tab_manager.path_index(tab.file_path)
+        if index == -1 or self.tab_manager.slots[index].widget is not tab:  # The tab was closed
+            return
+
+        end = _chunk_end(text, start)
+        cursor = QtGui.QTextCursor(tab.document())
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.insertText(text[start:end])
+
+        if end < len(text):
+            QtCore.QTimer.singleShot(0, lambda: self._append_file_chunk(tab, text, end))
+        else:
+            tab.document().setUndoRedoEnabled(True)
+            # Appending the chunks marked the document as edited
+            tab.document().setModified(False)
+            tab.setReadOnly(False)
+            tab.set_loading_size(None)
+            self.tab_manager.slots[index].loading = False
 
     def open_project(self):
         """
         Closes the current tabs and opens the selected folder. A dialog prompting the user
-        if they would like to save open tabs will determine if tabs get saved or not.
+        if they would like to save open tabs will determine if tabs get saved or not,
+        cancelling it keeps the current project open.
         """
         file = QtWidgets.QFileDialog.getExistingDirectory(self, 'Select Directory')
         if not file:
             return
         path = Path(file)
+        # Reopening the current project would only close its tabs
+        if path == self.file_manager.root_path:
+            return
 
-        if self.tab_manager.tab_paths:
+        if self.tab_manager.slots:
+            buttons = QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No | QtWidgets.QMessageBox.Cancel
             save = QtWidgets.QMessageBox.question(self, 'Save Existing', 'Would you like to save opened files?',
-                                                  QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No, QtWidgets.QMessageBox.No)
-            if save == QtWidgets.QMessageBox.Yes:
-                self.tab_manager.close_all_tabs(True)
-            else:
-                self.tab_manager.close_all_tabs(False)
+                                                  buttons, QtWidgets.QMessageBox.No)
+            if save == QtWidgets.QMessageBox.Cancel:
+                return
+            self.tab_manager.close_all_tabs(save == QtWidgets.QMessageBox.Yes)
 
-        self.tab_manager.close_all_tabs()
         self.file_manager.refresh_tree(path)
 
     def save_files(self):
         self.tab_manager.save_files()
 
+    @QtCore.Slot(bool)
+    def set_large_file_highlighting(self, enabled: bool):
+        """Highlights files of any size when enabled, otherwise large JSON files are left plain."""
+        self.tab_manager.set_max_highlight_size(None if enabled else MAX_HIGHLIGHT_SIZE)
+
     @staticmethod
     def open_about():
+        import webbrowser
         webbrowser.open('https://github.com/nate-maxwell/Cypher')
 
+    def _start_runner(self):
+        """Starts the process tab code is run in."""
+        self._runner = QtCore.QProcess(self)
+        self._runner.setProcessChannelMode(QtCore.QProcess.MergedChannels)
+        self._runner.readyReadStandardOutput.connect(self._read_runner_output)
+        self._runner.finished.connect(self._on_runner_finished)
+        self._runner.errorOccurred.connect(self._on_runner_error)
+        self._runner_buffer = b''
+        self._runner.start(self.interpreter, ['-u', RUNNER_PATH.as_posix()])
+
+    def _stop_runner(self):
+        """Kills the runner process, discarding anything it hasn't sent yet."""
+        if self._runner is None:
+            return
+
+        self._runner.blockSignals(True)
+        self._runner.kill()
+        self._runner.waitForFinished(1000)
+        self._runner.deleteLater()
+        self._runner = None
+
+    def _send_to_runner(self, op: str, code: str, name: str) -> bool:
+        """
+        Sends a request to the runner, starting it first if it isn't running.
+
+        Args:
+            op: The request type, 'run', 'compile' or 'reset'.
+
+            code: The python source of the tab.
+
+            name: The tab name, used as the filename in tracebacks.
+
+        Returns:
+            bool: False if the runner couldn't be started.
+        """
+        if self._runner is None:
+            self._start_runner()
+            if self._runner is None:
+                return False
+
+        source = code.encode('utf-8')
+        self._runner.write(f'{op} {len(source)} {name}\n'.encode('utf-8') + source)
+        return True
+
     def run_code(self):
         """
-        Runs the code typed in the self.te_text_editor by redirecting
-        the stdout value to the self.te_output widget.
+        Runs the code of the current tab in the runner process, streaming
+        its stdout into the self.tb_output widget as it is printed.
         """
-        code = self.tab_manager.currentWidget().toPlainText()
-        output_stream = StringIO()
+        if not self._restored or self._running or self.tab_manager.currentWidget() is None:
+            return
+
+        # The tab only holds part of its file until the last chunk is added
+        if self.tab_manager.slots[self.tab_manager.currentIndex()].loading:
+            self.tb_output.setPlainText('The file is still loading.\n')
+            return
+
+        code: str = self.tab_manager.currentWidget().toPlainText()
+        name: str = self.tab_manager.tabText(self.tab_manager.currentIndex())
+        self.tb_output.clear()
+
+        if not self._send_to_runner('run', code, name):
+            return
+
+        self._running = True
+        self.btn_run.setEnabled(False)
+        self.btn_cancel.setEnabled(True)
+
+    def reset_namespace(self):
+        """Clears the variables and imports kept between runs."""
+        self._send_to_runner('reset', '', '')
+
+    def cancel_run(self):
+        """Interrupts the code currently being run. The runner is restarted, clearing its namespace."""
+        if not self._running:
+            return
+
+        self._stop_runner()
+        self._append_output('\nExecution cancelled.\n')
+        self._finish_run()
+
+    @QtCore.Slot()
+    def _read_runner_output(self):
+        """Appends the runner's output, finishing the run when its sentinel and timing arrive."""
+        data = self._runner.readAllStandardOutput().data()
+        buffer = self._runner_buffer + data if self._runner_buffer else data
+        sentinel = RUN_SENTINEL.encode('utf-8')
+
+        # A single read can hold output, a run's timing and the next output, draw them together
+        with cypher.updates_suspended(self.tb_output, block_signals=True):
+            buffer = self._consume_runner_output(buffer, sentinel)
+
+        self._runner_buffer = buffer
 
+    def _consume_runner_output(self, buffer: bytes, sentinel: bytes) -> bytes:
+        """
+        Appends the output in the buffer, finishing a run for each sentinel and timing line found.
+        The buffer is scanned in place and each run's output is inserted with a single call.
+
+        Args:
+            buffer: The bytes read from the runner that haven't been handled yet.
+
+            sentinel: The encoded RUN_SENTINEL.
+
+        Returns:
+            bytes: Any trailing part of a timing line that hasn't fully arrived yet.
+        """
+        view = memoryview(buffer)
         start = 0
-        with contextlib.redirect_stdout(output_stream):
+        while True:
+            marker = buffer.find(sentinel, start)
+            if marker == -1:
+                self._append_output(self._runner_decoder.decode(view[start:]))
+                return b''
+
+            end = buffer.find(b'\n', marker)
+            if end == -1:
+                # Wait for the rest of the timing line
+                self._append_output(self._runner_decoder.decode(view[start:marker]))
+                return buffer[marker:]
+
+            self._append_output(self._runner_decoder.decode(view[start:marker]))
             try:
-                start = time.perf_counter()
-                exec(code)
-            except Exception as e:
-                print(e)
+                elapsed_ns = int(buffer[marker + len(sentinel):end])
+            except ValueError:
+                # Not a timing line, written to the process's stdout around the runner's stream
+                self._append_output(self._runner_decoder.decode(view[marker:marker + len(sentinel)]))
+                start = marker + len(sentinel)
+                continue
 
-        output = output_stream.getvalue()
-        end = time.perf_counter()
+            self._on_exec_done(elapsed_ns)
+            start = end + 1
+
+    @QtCore.Slot(int, QtCore.QProcess.ExitStatus)
+    def _on_runner_finished(self, exit_code: int, exit_status: QtCore.QProcess.ExitStatus):
+        """Reports the runner exiting on its own, it is started again by the next run."""
+        self._runner.deleteLater()
+        self._runner = None
+        if self._running:
+            self._append_output(f'\nRunner exited with code {exit_code}.\n')
+            self._finish_run()
+
+    @QtCore.Slot(QtCore.QProcess.ProcessError)
+    def _on_runner_error(self, error: QtCore.QProcess.ProcessError):
+        if error != QtCore.QProcess.FailedToStart:
+            return
+
+        self._runner.deleteLater()
+        self._runner = None
+        self._append_output(f'Could not start the interpreter {self.interpreter}.\n')
+        if self._running:
+            self._finish_run()
 
-        if start:
-            elapsed_time = end - start
-            output_text = f'Executed in {elapsed_time} seconds:\n\n{output}'
+    def _append_output(self, text: str):
+        if not text:
+            return
+        self.tb_output.moveCursor(QtGui.QTextCursor.End)
+        self.tb_output.insertPlainText(text)
+
+    def _on_exec_done(self, elapsed_ns: int):
+        """Adds the timing header to the output and re-enables running."""
+        # The code didn't compile, only the error was printed
+        if elapsed_ns < 0:
+            self._finish_run()
+            return
+
+        header = f'Executed in {elapsed_ns / 1e6:.3f} ms:\n\n'
+        # The header adds a block for each of its line breaks
+        if self.tb_output.blockCount() <= OUTPUT_MAX_BLOCKS - header.count('\n'):
+            cursor = QtGui.QTextCursor(self.tb_output.document())
+            cursor.insertText(header)
         else:
-            output_text = output
-        self.tb_output.setPlainText(output_text)
+            # The output is at the cap, a header at the start would be trimmed straight away
+            self._append_output(f'\n{header}')
+
+        self._finish_run()
+
+    def _finish_run(self):
+        self._running = False
+        self.btn_run.setEnabled(True)
+        self.btn_cancel.setEnabled(False)
 
 
 def main():
@@ -7,47 +7,104 @@
 """
 
 
+import functools
+import re
+from typing import Optional
+
 from PySide2 import QtCore
 from PySide2 import QtGui
 
 
-class HighlightRule(object):
-    def __init__(self, pattern: str, char_format: QtGui.QTextCharFormat):
-        self.pattern = pattern
-        self.format = char_format
+# Documents with more characters than this aren't highlighted, highlighting them stalls the GUI
+MAX_HIGHLIGHT_SIZE = 500_000
+
+# Matches a string, with the whitespace and colon after it when it is a key, or a number.
+# Escaped quotes don't end a string and an unterminated string runs to the end of the line
+_TOKEN_PATTERN = re.compile(r'("(?:[^"\\]|\\.)*"?)(\s*:)?|[-0-9.][-+0-9.eE]*')
 
 
 class JsonHighlighter(QtGui.QSyntaxHighlighter):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, max_size: Optional[int] = MAX_HIGHLIGHT_SIZE):
         """Initialize rules with expression pattern and text format."""
         super(JsonHighlighter, self).__init__(parent)
 
-        self.rules = list()
+        # Parallel lists, the format at each index is applied to the pattern's matches
+        self._patterns, self._formats = self._compile_rules()
+        self.max_size = max_size
+        # Size the document will have once its file has loaded, None when it is fully loaded
+        self.loading_size: Optional[int] = None
+        # Tokenize each block in a single pass instead of sweeping it with every rule
+        self.use_fast_path: bool = True
+
+    def set_max_highlight_size(self, size: Optional[int]):
+        """
+        Sets the document size above which highlighting is skipped and re-highlights the document.
+
+        Args:
+            size: The maximum number of characters to highlight, None highlights documents of any size.
+        """
+        self.max_size = size
+        self.rehighlight()
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _compile_rules(cls) -> tuple[list[re.Pattern], list[QtGui.QTextCharFormat]]:
+        """Build the highlighting rules once and reuse them for every document."""
+        patterns = list()
+        formats = list()
 
         # numeric value
         char_format = QtGui.QTextCharFormat()
         char_format.setForeground(QtCore.Qt.blue)
         char_format.setFontWeight(QtGui.QFont.Bold)
-        pattern = QtCore.QRegExp("([-0-9.]+)(?!([^\"]*\"[\\s]*\\:))")
+        pattern = re.compile("([-0-9.]+)(?!([^\"]*\"[\\s]*\\:))")
 
-        rule = HighlightRule(pattern, char_format)
-        self.rules.append(rule)
+        patterns.append(pattern)
+        formats.append(char_format)
 
         # key
         char_format = QtGui.QTextCharFormat()
-        pattern = QtCore.QRegExp("(\"[^\"]*\")\\s*\\:")
+        pattern = re.compile("(\"[^\"]*\")\\s*\\:")
         char_format.setFontWeight(QtGui.QFont.Bold)
 
-        rule = HighlightRule(pattern, char_format)
-        self.rules.append(rule)
+        patterns.append(pattern)
+        formats.append(char_format)
 
         # value
         char_format = QtGui.QTextCharFormat()
-        pattern = QtCore.QRegExp(":+(?:[: []*)(\"[^\"]*\")")
+        pattern = re.compile(":+(?:[: []*)(\"[^\"]*\")")
         char_format.setForeground(QtCore.Qt.darkGreen)
 
-        rule = HighlightRule(pattern, char_format)
-        self.rules.append(rule)
+        patterns.append(pattern)
+        formats.append(char_format)
+
+        return patterns, formats
+
+    def _tokenize(self, text: str) -> list[tuple[int, int, QtGui.QTextCharFormat]]:
+        """
+        Splits a line of json into the spans to highlight in a single pass, strings
+        followed by a colon are keys and any other string is a value.
+
+        Args:
+            text(str): The line to tokenize.
+
+        Returns:
+            list[tuple[int, int, QtGui.QTextCharFormat]]: The start, length and format of each span.
+        """
+        number_format, key_format, value_format = self._formats
+        spans = list()
+
+        for match in _TOKEN_PATTERN.finditer(text):
+            start, end = match.span(1)
+            if start == -1:
+                start, end = match.span()
+                spans.append((start, end - start, number_format))
+            elif match.start(2) == -1:
+                spans.append((start, end - start, value_format))
+            else:
+                spans.append((start, end - start, key_format))
+
+        return spans
 
     def highlightBlock(self, text: str):
         """
@@ -57,17 +114,24 @@ class JsonHighlighter(QtGui.QSyntaxHighlighter):
         Args:
             text(str): The text to perform a keyword highlighting check on.
         """
-        for rule in self.rules:
-            # create a regular expression from the retrieved pattern
-            expression = QtCore.QRegExp(rule.pattern)
-
-            # check what index that expression occurs at with the ENTIRE text
-            index = expression.indexIn(text)
-            while index >= 0:
-                # get the length of how long the expression is
-                # set format from the start to the length with the text format
-                length = expression.matchedLength()
-                self.setFormat(index, length, rule.format)
-
-                # set index to where the expression ends in the text
-                index = expression.indexIn(text, index + length)
+        if self.max_size is not None:
+            # A file still being loaded is judged by its full size, so it isn't highlighted up to the limit
+            if self.loading_size is not None:
+                if self.loading_size > self.max_size:
+                    return
+            else:
+                doc = self.document()
+                if doc is not None and doc.characterCount() > self.max_size:
+                    return
+
+        set_format = self.setFormat
+        if self.use_fast_path:
+            for start, length, char_format in self._tokenize(text):
+                set_format(start, length, char_format)
+            return
+
+        for pattern, char_format in zip(self._patterns, self._formats):
+            # set the format over every non-overlapping match of the expression in the text
+            for match in pattern.finditer(text):
+                start, end = match.span()
+                set_format(start, end - start, char_format)
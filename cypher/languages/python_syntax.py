@@ -9,6 +9,9 @@ Based on https://wiki.python.org/moin/PyQt/Python%20syntax%20highlighting
 """
 
 
+import functools
+import re
+
 from PySide2 import QtGui
 from PySide2 import QtCore
 
@@ -53,6 +56,13 @@ STYLES = {
 }
 
 
+# Patterns for single-line strings, which may contain triple quotes to be skipped
+STRING_PATTERNS = (r'"[^"\\]*(\\.[^"\\]*)*"', r"'[^'\\]*(\\.[^'\\]*)*'")
+
+# Number of distinct lines whose matched rules are remembered by each highlighter
+SPAN_CACHE_SIZE = 4096
+
+
 class PythonHighlighter(QtGui.QSyntaxHighlighter):
     """Syntax highlighter for the Python language."""
     # Python keywords
@@ -90,6 +100,21 @@ class PythonHighlighter(QtGui.QSyntaxHighlighter):
         self.tri_single = (QtCore.QRegExp("'''"), 1, STYLES['string2'])
         self.tri_double = (QtCore.QRegExp('"""'), 2, STYLES['string2'])
 
+        self.rules = self._compile_rules()
+
+        # Line text -> (format spans, triple quote indexes within strings)
+        self._span_cache: dict[str, tuple[list[tuple[int, int, QtGui.QTextCharFormat]], list[int]]] = {}
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _compile_rules(cls) -> list[tuple[re.Pattern, int, QtGui.QTextCharFormat]]:
+        """
+        Build the highlighting rules once and reuse them for every document.
+
+        Returns:
+            list[tuple[re.Pattern, int, QTextCharFormat]]: The expression, nth capture group
+            and format of each rule.
+        """
         rules = []
 
         # Keyword, operator, and brace rules
@@ -113,17 +138,17 @@ class PythonHighlighter(QtGui.QSyntaxHighlighter):
             (r'\b[+-]?[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?\b', 0, STYLES['numbers']),
 
             # Double-quoted string, possibly containing escape sequences
-            (r'"[^"\\]*(\\.[^"\\]*)*"', 0, STYLES['string']),
+            (STRING_PATTERNS[0], 0, STYLES['string']),
             # Single-quoted string, possibly containing escape sequences
-            (r"'[^'\\]*(\\.[^'\\]*)*'", 0, STYLES['string']),
+            (STRING_PATTERNS[1], 0, STYLES['string']),
 
             # From '#' until a newline
             (r'#[^\n]*', 0, STYLES['comment']),
         ]
 
-        # Build a QRegExp for each pattern
-        self.rules = [(QtCore.QRegExp(pat), index, fmt)
-                      for (pat, index, fmt) in rules]
+        # Compile each pattern
+        return [(re.compile(pat), index, fmt)
+                for (pat, index, fmt) in rules]
 
     def highlightBlock(self, text: str):
         """
@@ -133,42 +158,66 @@ class PythonHighlighter(QtGui.QSyntaxHighlighter):
         Args:
             text(str): The text to analyze for highlighting.
         """
-        self.tripleQuoutesWithinStrings = []
-        # Do other syntax formatting
+        # Blocks are re-highlighted whenever a multi-line string above them changes,
+        # the single-line rules only need matching again when the text itself changed
+        matched = self._span_cache.get(text)
+        if matched is None:
+            matched = self._match_rules(text)
+            if len(self._span_cache) >= SPAN_CACHE_SIZE:
+                self._span_cache.clear()
+            self._span_cache[text] = matched
+
+        spans, self.tripleQuoutesWithinStrings = matched
+        for index, length, format in spans:
+            self.setFormat(index, length, format)
+
+        self.setCurrentBlockState(0)
+
+        # Do multi-line strings
+        in_multiline = self.match_multiline(text, *self.tri_single)
+        if not in_multiline:
+            in_multiline = self.match_multiline(text, *self.tri_double)
+
+    def _match_rules(self, text: str) -> tuple[list[tuple[int, int, QtGui.QTextCharFormat]], list[int]]:
+        """
+        Match the single-line rules against a line of text.
+
+        Args:
+            text(str): The text to match the rules against.
+
+        Returns:
+            tuple[list, list[int]]: The (index, length, format) span of every match in the order
+            they should be applied, and the indexes of triple quotes found within strings.
+        """
+        spans = []
+        triple_quotes_within_strings = []
         for expression, nth, format in self.rules:
-            index = expression.indexIn(text, 0)
-            if index >= 0:
+            match = expression.search(text)
+            if match is not None:
                 # if there is a string we check
                 # if there are some triple quotes within the string
                 # they will be ignored if they are matched again
-                if expression.pattern() in [r'"[^"\\]*(\\.[^"\\]*)*"', r"'[^'\\]*(\\.[^'\\]*)*'"]:
-                    innerIndex = self.tri_single[0].indexIn(text, index + 1)
+                if expression.pattern in STRING_PATTERNS:
+                    innerIndex = self.tri_single[0].indexIn(text, match.start() + 1)
                     if innerIndex == -1:
-                        innerIndex = self.tri_double[0].indexIn(text, index + 1)
+                        innerIndex = self.tri_double[0].indexIn(text, match.start() + 1)
 
                     if innerIndex != -1:
                         tripleQuoteIndexes = range(innerIndex, innerIndex + 3)
-                        self.tripleQuoutesWithinStrings.extend(tripleQuoteIndexes)
+                        triple_quotes_within_strings.extend(tripleQuoteIndexes)
 
-            while index >= 0:
+            while match is not None:
                 # skipping triple quotes within strings
-                if index in self.tripleQuoutesWithinStrings:
-                    index += 1
-                    expression.indexIn(text, index)
+                if match.start() in triple_quotes_within_strings:
+                    match = expression.search(text, match.start() + 1)
                     continue
 
                 # We actually want the index of the nth match
-                index = expression.pos(nth)
-                length = len(expression.cap(nth))
-                self.setFormat(index, length, format)
-                index = expression.indexIn(text, index + length)
-
-        self.setCurrentBlockState(0)
+                index, end = match.span(nth)
+                spans.append((index, end - index, format))
+                match = expression.search(text, end)
 
-        # Do multi-line strings
-        in_multiline = self.match_multiline(text, *self.tri_single)
-        if not in_multiline:
-            in_multiline = self.match_multiline(text, *self.tri_double)
+        return spans, triple_quotes_within_strings
 
     def match_multiline(self, text: str, delimiter: QtCore.QRegExp,in_state: int, style: QtGui.QColor) -> bool:
         """